@@ -41,12 +41,13 @@ class AtomicFile:
     place or abort() to cancel.
     """
 
-    __slots__ = ["tmpfilename", "realfilename", "_fd"]
+    __slots__ = ["tmpfilename", "realfilename", "_fd", "_buffered"]
 
     def __init__(self, filename, mode="wb", new_mode=None):
         global _hostname
 
         self._fd = None
+        self._buffered = []
 
         if _hostname is None:
             _hostname = osutils.get_host_name()
@@ -84,7 +85,11 @@ class AtomicFile:
 
     def write(self, data):
         """Write some data to the file. Like file.write()."""
-        return os.write(self._fd, data)
+        # The fd is unbuffered, so every os.write is a syscall; callers
+        # typically write many small pieces. Collect them and write the
+        # whole file in one go when committing.
+        self._buffered.append(data)
+        return len(data)
 
     def _close_tmpfile(self, func_name):
         """Close the local temp file in preparation for commit or abort."""
@@ -96,6 +101,9 @@ class AtomicFile:
 
     def commit(self):
         """Close the file and move to final name."""
+        if self._fd is not None and self._buffered:
+            os.write(self._fd, b"".join(self._buffered))
+            self._buffered = []
         self._close_tmpfile("commit")
         osutils.rename(self.tmpfilename, self.realfilename)
 
@@ -952,6 +952,15 @@ class Branch(ControlComponent):
         """Given a revision id, return its revno."""
         if _mod_revision.is_null(revision_id):
             return 0
+        # When a previous caller already paid to build the full revno
+        # map, a hash lookup there beats the O(history) index() scan.
+        revno_map = self._revision_id_to_revno_cache
+        if revno_map is not None:
+            dotted = revno_map.get(revision_id)
+            if dotted is not None and len(dotted) == 1:
+                return dotted[0]
+            # Unknown, or a merged revision with no mainline revno.
+            raise errors.NoSuchRevision(self, revision_id)
         history = self._revision_history()
         try:
             return history.index(revision_id) + 1
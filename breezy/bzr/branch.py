@@ -53,6 +53,9 @@ from .repository import MetaDirRepository
 if TYPE_CHECKING:
     from .remote import RemoteRepository
 
+# Sentinel distinguishing "not probed yet" from a probed None parent.
+_PARENT_LOCATION_UNKNOWN = object()
+
 
 class BzrBranch(Branch, _RelockDebugMixin):
     """A branch stored in the actual filesystem.
@@ -102,6 +105,7 @@ class BzrBranch(Branch, _RelockDebugMixin):
         self.conf_store = None
         Branch.__init__(self, possible_transports)
         self._tags_bytes = None
+        self._parent_location = _PARENT_LOCATION_UNKNOWN
 
     def __str__(self):
         return f"{self.__class__.__name__}({self.user_url})"
@@ -261,15 +265,22 @@ class BzrBranch(Branch, _RelockDebugMixin):
         return self.repository.revision_tree(self.last_revision())
 
     def _get_parent_location(self):
+        # Probing the three candidate files costs up to three round trips
+        # on a remote transport; remember the answer for this lock scope.
+        if self._parent_location is not _PARENT_LOCATION_UNKNOWN:
+            return self._parent_location
         _locs = ["parent", "pull", "x-pull"]
+        location = None
         for l in _locs:
             try:
                 contents = self._transport.get_bytes(l)
             except _mod_transport.NoSuchFile:
                 pass
             else:
-                return contents.strip(b"\n").decode("utf-8")
-        return None
+                location = contents.strip(b"\n").decode("utf-8")
+                break
+        self._parent_location = location
+        return location
 
     def get_stacked_on_url(self):
         raise UnstackableBranchFormat(self._format, self.user_url)
@@ -283,12 +294,17 @@ class BzrBranch(Branch, _RelockDebugMixin):
     def _set_parent_location(self, url):
         if url is None:
             self._transport.delete("parent")
+            # A legacy pull or x-pull file may still answer; re-probe.
+            self._parent_location = _PARENT_LOCATION_UNKNOWN
         else:
-            if isinstance(url, str):
-                url = url.encode("utf-8")
+            if isinstance(url, bytes):
+                url = url.decode("utf-8")
             self._transport.put_bytes(
-                "parent", url + b"\n", mode=self.controldir._get_file_mode()
+                "parent",
+                url.encode("utf-8") + b"\n",
+                mode=self.controldir._get_file_mode(),
             )
+            self._parent_location = url
 
     def unbind(self):
         """If bound, unbind."""
@@ -444,6 +460,7 @@ class BzrBranch(Branch, _RelockDebugMixin):
     def _clear_cached_state(self):
         super()._clear_cached_state()
         self._tags_bytes = None
+        self._parent_location = _PARENT_LOCATION_UNKNOWN
 
     def reconcile(self, thorough=True):
         """Make sure the data stored in this branch is consistent."""
@@ -17,6 +17,8 @@
 
 import contextlib
 import errno
+import io
+import mmap
 import os
 import tempfile
 import time
@@ -41,6 +43,7 @@ from ..i18n import gettext
 from ..mutabletree import MutableTree
 from ..progress import ProgressPhase
 from ..transform import (
+    FILE_CONTENT_CHUNK_SIZE,
     ROOT_PARENT,
     FinalPaths,
     ImmortalLimbo,
@@ -50,6 +53,7 @@ from ..transform import (
     ReusingTransform,
     TransformRenameFailed,
     TreeTransform,
+    _copy_into_file,
     _FileMover,
     _reparent_children,
     _TransformResults,
@@ -63,6 +67,33 @@ from ..tree import find_previous_path
 from . import inventory, inventorytree
 from .conflicts import Conflict
 
+# Files below this size are compared with plain chunked reads; above it,
+# mapping both sides and letting memcmp do the work is a clear win.
+_MMAP_COMPARE_THRESHOLD = 64 * 1024
+
+
+def _files_same_content(f1, f2):
+    """Compare two open binary files for equal content.
+
+    When both files are real on-disk files, equal-sized pairs are mapped
+    and compared in one go; otherwise fall back to chunked comparison.
+    """
+    try:
+        fd1 = f1.fileno()
+        fd2 = f2.fileno()
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        fd1 = fd2 = None
+    if fd1 is not None and fd2 is not None:
+        size = os.fstat(fd1).st_size
+        if size != os.fstat(fd2).st_size:
+            return False
+        if size > _MMAP_COMPARE_THRESHOLD:
+            with mmap.mmap(fd1, 0, access=mmap.ACCESS_READ) as m1, mmap.mmap(
+                fd2, 0, access=mmap.ACCESS_READ
+            ) as m2:
+                return memoryview(m1) == memoryview(m2)
+    return osutils.compare_files(f1, f2)
+
 
 def _content_match(tree, entry, tree_path, kind, target_path):
     if entry.kind != kind:
@@ -70,8 +101,12 @@ def _content_match(tree, entry, tree_path, kind, target_path):
     if entry.kind == "directory":
         return True
     if entry.kind == "file":
+        # A size mismatch rules the file out without reading any content.
+        text_size = entry.text_size
+        if text_size is not None and os.path.getsize(target_path) != text_size:
+            return False
         with open(target_path, "rb") as f1, tree.get_file(tree_path) as f2:
-            if osutils.compare_files(f1, f2):
+            if _files_same_content(f1, f2):
                 return True
     elif entry.kind == "symlink":
         if tree.get_symlink_target(tree_path) == os.readlink(target_path):
@@ -129,8 +164,10 @@ class TreeTransformBase(TreeTransform):
     def create_path(self, name, parent):
         """Assign a transaction id to a new path."""
         trans_id = self.assign_id()
-        unique_add(self._new_name, trans_id, name)
-        unique_add(self._new_parent, trans_id, parent)
+        # trans_id is freshly allocated, so it cannot already be present;
+        # plain stores avoid the unique_add call and membership checks.
+        self._new_name[trans_id] = name
+        self._new_parent[trans_id] = parent
         return trans_id
 
     def adjust_root_path(self, name, parent):
@@ -1322,6 +1359,19 @@ class DiskTreeTransform(TreeTransformBase):
         if sha1 is not None:
             self._observed_sha1s[trans_id] = (sha1, osutils.lstat(name))
 
+    def create_file_from_fd(self, source, trans_id, mode_id=None):
+        """Schedule creation of a new file, copying from an open file.
+
+        When source is backed by a real file descriptor, the copy into
+        limbo happens inside the kernel; see _copy_into_file.
+        """
+        name = self._limbo_name(trans_id)
+        with open(name, "wb") as f:
+            unique_add(self._new_contents, trans_id, "file")
+            _copy_into_file(source, f)
+        self._set_mtime(name)
+        self._set_mode(trans_id, mode_id, S_ISREG)
+
     def _read_symlink_target(self, trans_id):
         return os.readlink(self._limbo_name(trans_id))
 
@@ -2354,7 +2404,8 @@ def build_tree(tree, wt, accelerator_tree=None, hardlink=False, delta_from_tree=
 
 def resolve_checkout(tt, conflicts, divert):
     new_conflicts = set()
-    for c_type, conflict in ((c[0], c) for c in conflicts):
+    for conflict in conflicts:
+        c_type = conflict[0]
         # Anything but a 'duplicate' would indicate programmer error
         if c_type != "duplicate":
             raise AssertionError(c_type)
@@ -2382,9 +2433,11 @@ def resolve_checkout(tt, conflicts, divert):
 
 def _build_tree(tree, wt, accelerator_tree, hardlink, delta_from_tree):
     """See build_tree."""
-    for num, _unused in enumerate(wt.all_versioned_paths()):
-        if num > 0:  # more than just a root
-            raise errors.WorkingTreeAlreadyPopulated(base=wt.basedir)
+    versioned_paths = iter(wt.all_versioned_paths())
+    next(versioned_paths, None)
+    if next(versioned_paths, None) is not None:  # more than just a root
+        raise errors.WorkingTreeAlreadyPopulated(base=wt.basedir)
+    del versioned_paths
     file_trans_id = {}
     top_pb = ui.ui_factory.nested_progress_bar()
     pp = ProgressPhase("Build phase", 2, top_pb)
@@ -2403,30 +2456,70 @@ def _build_tree(tree, wt, accelerator_tree, hardlink, delta_from_tree):
     divert = set()
     try:
         pp.next_phase()
-        file_trans_id[find_previous_path(wt, tree, "")] = tt.trans_id_tree_path("")
+        root_trans_id = tt.trans_id_tree_path("")
+        file_trans_id[find_previous_path(wt, tree, "")] = root_trans_id
+        # iter_entries_by_dir yields parents before children, so mapping
+        # file ids to trans_ids lets the loop find each entry's parent
+        # without re-deriving it from the path.
+        file_id_to_trans_id = {}
+        tree_root_id = tree.path2id("")
+        if tree_root_id is not None:
+            file_id_to_trans_id[tree_root_id] = root_trans_id
         with ui.ui_factory.nested_progress_bar() as pb:
             deferred_contents = []
             num = 0
-            total = len(tree.all_versioned_paths())
-            precomputed_delta = [] if delta_from_tree else None
+            # Materialize the entries once: all_versioned_paths() would
+            # walk the same inventory a second time just for the count.
+            entries = list(tree.iter_entries_by_dir())
+            total = len(entries)
+            # The delta rows are materialized after conflict resolution;
+            # the loop itself only stages paths and entries in parallel
+            # lists, avoiding a tuple allocation per row.
+            delta_paths = [] if delta_from_tree else None
+            delta_entries = [] if delta_from_tree else None
             # Check if tree inventory has content. If so, we populate
             # existing_files with the directory content. If there are no
             # entries we skip populating existing_files as its not used.
             # This improves performance and unncessary work on large
             # directory trees. (#501307)
+            has_existing = False
             if total > 0:
+                # Only relative paths are needed for the membership test
+                # below, so walk the disk directly with os.scandir rather
+                # than loading per-entry metadata via wt.walkdirs().
                 existing_files = set()
-                for _dir, files in wt.walkdirs():
-                    existing_files.update(f[0] for f in files)
-            for num, (tree_path, entry) in enumerate(tree.iter_entries_by_dir()):
-                pb.update(gettext("Building tree"), num - len(deferred_contents), total)
+                pending_dirs = [""]
+                while pending_dirs:
+                    subdir = pending_dirs.pop()
+                    prefix = subdir + "/" if subdir else ""
+                    with os.scandir(wt.abspath(subdir)) as direntries:
+                        for direntry in direntries:
+                            relpath = prefix + direntry.name
+                            if wt.is_control_filename(relpath):
+                                continue
+                            existing_files.add(relpath)
+                            if direntry.is_dir(follow_symlinks=False):
+                                pending_dirs.append(relpath)
+                has_existing = bool(existing_files)
+            # Hoist per-iteration attribute lookups out of the hot loop.
+            building_msg = gettext("Building tree")
+            pb_update = pb.update
+            deferred_append = deferred_contents.append
+            tt_create_path = tt.create_path
+            tt_version_file = tt.version_file
+            tt_set_executability = tt.set_executability
+            tt_trans_id_tree_path = tt.trans_id_tree_path
+            tree_is_executable = tree.is_executable
+            for num, (tree_path, entry) in enumerate(entries):
+                pb_update(building_msg, num - len(deferred_contents), total)
                 if entry.parent_id is None:
                     continue
                 reparent = False
                 file_id = entry.file_id
                 if delta_from_tree:
-                    precomputed_delta.append((None, tree_path, file_id, entry))
-                if tree_path in existing_files:
+                    delta_paths.append(tree_path)
+                    delta_entries.append(entry)
+                if has_existing and tree_path in existing_files:
                     target_path = wt.abspath(tree_path)
                     kind = file_kind(target_path)
                     if kind == "directory":
@@ -2439,28 +2532,34 @@ def _build_tree(tree, wt, accelerator_tree, hardlink, delta_from_tree):
                     if tree_path not in divert and _content_match(
                         tree, entry, tree_path, kind, target_path
                     ):
-                        tt.delete_contents(tt.trans_id_tree_path(tree_path))
+                        tt.delete_contents(tt_trans_id_tree_path(tree_path))
                         if kind == "directory":
                             reparent = True
-                parent_id = file_trans_id[osutils.dirname(tree_path)]
+                parent_id = file_id_to_trans_id[entry.parent_id]
                 if entry.kind == "file":
                     # We *almost* replicate new_by_entry, so that we can defer
                     # getting the file text, and get them all at once.
-                    trans_id = tt.create_path(entry.name, parent_id)
+                    trans_id = tt_create_path(entry.name, parent_id)
                     file_trans_id[tree_path] = trans_id
-                    tt.version_file(trans_id, file_id=file_id)
-                    executable = tree.is_executable(tree_path)
+                    file_id_to_trans_id[file_id] = trans_id
+                    tt_version_file(trans_id, file_id=file_id)
+                    # The inventory entry already carries the executable
+                    # bit; only fall back to asking the tree when it is
+                    # unknown.
+                    executable = entry.executable
+                    if executable is None:
+                        executable = tree_is_executable(tree_path)
                     if executable:
-                        tt.set_executability(executable, trans_id)
+                        tt_set_executability(executable, trans_id)
                     trans_data = (trans_id, tree_path, entry.text_sha1)
-                    deferred_contents.append((tree_path, trans_data))
+                    deferred_append((tree_path, trans_data))
                 else:
-                    file_trans_id[tree_path] = new_by_entry(
-                        tree_path, tt, entry, parent_id, tree
-                    )
+                    trans_id = new_by_entry(tree_path, tt, entry, parent_id, tree)
+                    file_trans_id[tree_path] = trans_id
+                    file_id_to_trans_id[file_id] = trans_id
                 if reparent:
                     new_trans_id = file_trans_id[tree_path]
-                    old_parent = tt.trans_id_tree_path(tree_path)
+                    old_parent = tt_trans_id_tree_path(tree_path)
                     _reparent_children(tt, old_parent, new_trans_id)
             offset = num + 1 - len(deferred_contents)
             _create_files(
@@ -2473,11 +2572,17 @@ def _build_tree(tree, wt, accelerator_tree, hardlink, delta_from_tree):
             return resolve_checkout(t, c, divert_trans)
 
         raw_conflicts = resolve_conflicts(tt, pass_func=resolver)
-        if len(raw_conflicts) > 0:
+        if len(raw_conflicts) > 0 or not delta_from_tree:
             precomputed_delta = None
+        else:
+            precomputed_delta = [
+                (None, path, entry.file_id, entry)
+                for path, entry in zip(delta_paths, delta_entries)
+            ]
         conflicts = tt.cook_conflicts(raw_conflicts)
-        for conflict in conflicts:
-            trace.warning(str(conflict))
+        if conflicts:
+            # One bulk warning instead of a logging round-trip per conflict.
+            trace.warning("\n".join(str(conflict) for conflict in conflicts))
         with contextlib.suppress(errors.UnsupportedOperation):
             wt.add_conflicts(conflicts)
         result = tt.apply(no_conflicts=True, precomputed_delta=precomputed_delta)
@@ -2490,6 +2595,8 @@ def _build_tree(tree, wt, accelerator_tree, hardlink, delta_from_tree):
 def _create_files(tt, tree, desired_files, pb, offset, accelerator_tree, hardlink):
     total = len(desired_files) + offset
     wt = tt._tree
+    # Can touch config and the rules engine; ask once, not per file.
+    wt_supports_filtering = wt.supports_content_filtering()
     if accelerator_tree is None:
         new_desired_files = desired_files
     else:
@@ -2510,18 +2617,21 @@ def _create_files(tt, tree, desired_files, pb, offset, accelerator_tree, hardlin
         unchanged = dict(unchanged)
         new_desired_files = []
         count = 0
+        adding_msg = gettext("Adding file contents")
+        pb_update = pb.update
+        unchanged_get = unchanged.get
         for _unused_tree_path, (trans_id, tree_path, text_sha1) in desired_files:
-            accelerator_path = unchanged.get(tree_path)
+            accelerator_path = unchanged_get(tree_path)
             if accelerator_path is None:
                 new_desired_files.append((tree_path, (trans_id, tree_path, text_sha1)))
                 continue
-            pb.update(gettext("Adding file contents"), count + offset, total)
+            pb_update(adding_msg, count + offset, total)
             if hardlink:
                 tt.create_hardlink(accelerator_tree.abspath(accelerator_path), trans_id)
             else:
                 with accelerator_tree.get_file(accelerator_path) as f:
-                    chunks = osutils.file_iterator(f)
-                    if wt.supports_content_filtering():
+                    chunks = osutils.file_iterator(f, FILE_CONTENT_CHUNK_SIZE)
+                    if wt_supports_filtering:
                         filters = wt._content_filter_stack(tree_path)
                         chunks = filtered_output_bytes(
                             chunks, filters, ContentFilterContext(tree_path, tree)
@@ -2532,7 +2642,7 @@ def _create_files(tt, tree, desired_files, pb, offset, accelerator_tree, hardlin
     for count, ((trans_id, tree_path, text_sha1), contents) in enumerate(
         tree.iter_files_bytes(new_desired_files)
     ):
-        if wt.supports_content_filtering():
+        if wt_supports_filtering:
             filters = wt._content_filter_stack(tree_path)
             contents = filtered_output_bytes(
                 contents, filters, ContentFilterContext(tree_path, tree)
@@ -404,13 +404,14 @@ class Weave(VersionedFile):
     def get_parent_map(self, version_ids):
         """See VersionedFile.get_parent_map."""
         result = {}
+        names = self._names
         for version_id in version_ids:
             if version_id == NULL_REVISION:
                 parents = ()
             else:
                 try:
                     parents = tuple(
-                        map(self._idx_to_name, self._parents[self._lookup(version_id)])
+                        names[p] for p in self._parents[self._lookup(version_id)]
                     )
                 except RevisionNotPresent:
                     continue
@@ -604,7 +605,8 @@ class Weave(VersionedFile):
         if isinstance(version_ids, bytes):
             version_ids = [version_ids]
         i = self._inclusions([self._lookup(v) for v in version_ids])
-        return {self._idx_to_name(v) for v in i}
+        names = self._names
+        return {names[v] for v in i}
 
     def _check_versions(self, indexes):
         """Check everything in the sequence of indexes is valid."""
@@ -21,6 +21,7 @@ from email.message import Message
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from email.utils import formataddr, parseaddr
+from functools import lru_cache
 
 from . import __version__ as _breezy_version
 from .errors import BzrBadParameterNotUnicode
@@ -28,6 +29,44 @@ from .osutils import safe_unicode
 from .smtp_connection import SMTPConnection
 
 
+def _probe_string_with_encoding(string_):
+    # Python's email module base64-encodes the body whenever the charset is
+    # not explicitly set to ascii. Because of this, and because we want to
+    # avoid base64 when it's not necessary in order to be most compatible
+    # with the capabilities of the receiving side, we check with encode()
+    # and decode() whether the body is actually ascii-only.
+    if isinstance(string_, str):
+        try:
+            return (string_.encode("ascii"), "ascii")
+        except UnicodeEncodeError:
+            return (string_.encode("utf-8"), "utf-8")
+    else:
+        try:
+            string_.decode("ascii")
+            return (string_, "ascii")
+        except UnicodeDecodeError:
+            try:
+                string_.decode("utf-8")
+                return (string_, "utf-8")
+            except UnicodeDecodeError:
+                return (string_, "8-bit")
+
+
+_cached_probe_string_with_encoding = lru_cache(maxsize=128)(_probe_string_with_encoding)
+
+# The cache key is the string itself, so a cached entry pins the whole
+# payload (plus its encoded copy) for the life of the process. That is a
+# bad trade for one-off bundle attachments; only memoize strings small
+# enough that keeping them around is harmless.
+_CACHEABLE_STRING_SIZE = 4096
+
+
+def _string_with_encoding(string_):
+    if len(string_) <= _CACHEABLE_STRING_SIZE:
+        return _cached_probe_string_with_encoding(string_)
+    return _probe_string_with_encoding(string_)
+
+
 class EmailMessage:
     """An email message.
 
@@ -56,18 +95,21 @@ class EmailMessage:
         self._headers = {}
         self._body = body
         self._parts = []
+        self._cached_string = None
 
         if isinstance(to_address, (bytes, str)):
-            to_address = [to_address]
-
-        to_addresses = []
-
-        for addr in to_address:
-            to_addresses.append(self.address_to_encoded_header(addr))
-
-        self._headers["To"] = ", ".join(to_addresses)
+            # The common case is a single destination address; no need to
+            # wrap it in a list just to join it again.
+            self._headers["To"] = self.address_to_encoded_header(to_address)
+        else:
+            self._headers["To"] = ", ".join(
+                self.address_to_encoded_header(addr) for addr in to_address
+            )
         self._headers["From"] = self.address_to_encoded_header(from_address)
-        self._headers["Subject"] = Header(safe_unicode(subject))
+        subject = safe_unicode(subject)
+        # Header() sets up MIME encoding machinery even when there is
+        # nothing to encode; plain ASCII subjects can go through as-is.
+        self._headers["Subject"] = subject if subject.isascii() else Header(subject)
         self._headers["User-Agent"] = f"Bazaar ({_breezy_version})"
 
     def add_inline_attachment(self, body, filename=None, mime_subtype="plain"):
@@ -91,6 +133,7 @@ class EmailMessage:
             self._body = None
 
         self._parts.append((body, filename, mime_subtype))
+        self._cached_string = None
 
     def as_string(self, boundary=None):
         """Return the entire formatted message as a string.
@@ -98,6 +141,11 @@ class EmailMessage:
         :param boundary: The boundary to use between MIME parts, if applicable.
             Used for tests.
         """
+        # Serializing is not cheap; cache the result until a header or an
+        # attachment changes. An explicit boundary is only used by tests, so
+        # it's not worth keying the cache on it.
+        if boundary is None and self._cached_string is not None:
+            return self._cached_string
         if not self._parts:
             msgobj = Message()
             if self._body is not None:
@@ -125,7 +173,10 @@ class EmailMessage:
         for header, value in sorted(self._headers.items()):
             msgobj[header] = value
 
-        return msgobj.as_string()
+        result = msgobj.as_string()
+        if boundary is None:
+            self._cached_string = result
+        return result
 
     __str__ = as_string
 
@@ -142,6 +193,7 @@ class EmailMessage:
         return self._headers.get(header, None)
 
     def __setitem__(self, header, value):
+        self._cached_string = None
         return self._headers.__setitem__(header, value)
 
     @staticmethod
@@ -183,6 +235,9 @@ class EmailMessage:
         user, email = parseaddr(address)
         if not user:
             return email
+        elif user.isascii():
+            # No RFC2047 encoding needed, so skip the Header machinery.
+            return formataddr((user, email))
         else:
             return formataddr((str(Header(safe_unicode(user))), email))
 
@@ -194,23 +249,4 @@ class EmailMessage:
         :return: A tuple (str, encoding), where encoding is one of 'ascii',
             'utf-8', or '8-bit', in that preferred order.
         """
-        # Python's email module base64-encodes the body whenever the charset is
-        # not explicitly set to ascii. Because of this, and because we want to
-        # avoid base64 when it's not necessary in order to be most compatible
-        # with the capabilities of the receiving side, we check with encode()
-        # and decode() whether the body is actually ascii-only.
-        if isinstance(string_, str):
-            try:
-                return (string_.encode("ascii"), "ascii")
-            except UnicodeEncodeError:
-                return (string_.encode("utf-8"), "utf-8")
-        else:
-            try:
-                string_.decode("ascii")
-                return (string_, "ascii")
-            except UnicodeDecodeError:
-                try:
-                    string_.decode("utf-8")
-                    return (string_, "utf-8")
-                except UnicodeDecodeError:
-                    return (string_, "8-bit")
+        return _string_with_encoding(string_)
@@ -28,7 +28,9 @@ is also left to that stage of the process.
 
 import inspect
 import os
+import re
 import sys
+from io import StringIO
 
 import breezy
 
@@ -38,31 +40,40 @@ from . import plugin as _mod_plugin
 from .i18n import gettext
 from .trace import mutter, note
 
+_escape_re = re.compile(r'[\\\n\r\t"]')
+_escape_map = {
+    "\\": "\\\\",
+    "\n": "\\n",
+    "\r": "\\r",
+    "\t": "\\t",
+    '"': '\\"',
+}
+
 
 def _escape(s):
-    s = (
-        s.replace("\\", "\\\\")
-        .replace("\n", "\\n")
-        .replace("\r", "\\r")
-        .replace("\t", "\\t")
-        .replace('"', '\\"')
-    )
-    return s
+    # One pass instead of five chained str.replace scans.
+    return _escape_re.sub(lambda match: _escape_map[match.group(0)], s)
 
 
 def _normalize(s):
     # This converts the various Python string types into a format that
     # is appropriate for .po files, namely much closer to C style.
-    lines = s.split("\n")
-    if len(lines) == 1:
-        s = '"' + _escape(s) + '"'
-    else:
-        if not lines[-1]:
-            del lines[-1]
-            lines[-1] = lines[-1] + "\n"
-        lineterm = '\\n"\n"'
-        s = '""\n"' + lineterm.join(map(_escape, lines)) + '"'
-    return s
+    if "\n" not in s:
+        return '"' + _escape(s) + '"'
+
+    length = len(s)
+
+    def replace(match):
+        char = match.group(0)
+        if char != "\n":
+            return _escape_map[char]
+        # A trailing newline stays on the last PO line; any other
+        # newline also breaks the string across source lines.
+        return "\\n" if match.end() == length else '\\n"\n"'
+
+    # Escape and insert the line breaks in a single pass rather than
+    # split, escape per line and rejoin.
+    return '""\n"' + _escape_re.sub(replace, s) + '"'
 
 
 def _parse_source(source_text, filename="<unknown>"):
@@ -273,13 +284,12 @@ def _error_messages(exporter):
     """Extract fmt string from breezy.errors."""
     context = exporter.get_context(errors)
     base_klass = errors.BzrError
-    for name in dir(errors):
-        klass = getattr(errors, name)
-        if not inspect.isclass(klass):
-            continue
-        if not issubclass(klass, base_klass):
+    # Iterate the module dict directly rather than dir() plus getattr for
+    # every name; sort to keep the export order stable.
+    for name, klass in sorted(errors.__dict__.items()):
+        if not isinstance(klass, type):
             continue
-        if klass is base_klass:
+        if not issubclass(klass, base_klass) or klass is base_klass:
             continue
         if klass.internal_error:
             continue
@@ -307,7 +317,11 @@ def _help_topics(exporter):
 
 
 def export_pot(outf, plugin=None, include_duplicates=False):
-    exporter = _PotExporter(outf, include_duplicates)
+    # Accumulate the entries in memory and hand outf a single write:
+    # the export makes thousands of small entry writes, and outf may be
+    # an unbuffered stream.
+    buffer = StringIO()
+    exporter = _PotExporter(buffer, include_duplicates)
     if plugin is None:
         _standard_options(exporter)
         _command_helps(exporter)
@@ -315,3 +329,4 @@ def export_pot(outf, plugin=None, include_duplicates=False):
         _help_topics(exporter)
     else:
         _command_helps(exporter, plugin)
+    outf.write(buffer.getvalue())
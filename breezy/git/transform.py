@@ -38,6 +38,7 @@ from ..transform import (
     ReusingTransform,
     TransformRenameFailed,
     TreeTransform,
+    _copy_into_file,
     _FileMover,
     _TransformResults,
     joinpath,
@@ -949,6 +950,19 @@ class DiskTreeTransform(TreeTransformBase):
         if sha1 is not None:
             self._observed_sha1s[trans_id] = (sha1, osutils.lstat(name))
 
+    def create_file_from_fd(self, source, trans_id, mode_id=None):
+        """Schedule creation of a new file, copying from an open file.
+
+        When source is backed by a real file descriptor, the copy into
+        limbo happens inside the kernel; see _copy_into_file.
+        """
+        name = self._limbo_name(trans_id)
+        with open(name, "wb") as f:
+            unique_add(self._new_contents, trans_id, "file")
+            _copy_into_file(source, f)
+        self._set_mtime(name)
+        self._set_mode(trans_id, mode_id, S_ISREG)
+
     def _read_symlink_target(self, trans_id):
         return os.readlink(self._limbo_name(trans_id))
 
@@ -59,6 +59,22 @@ from ...repository import InterRepository
 from . import bzrdir as weave_bzrdir
 from .store.text import TextStore
 
+_empty_weave_bytes = None
+
+
+def _get_empty_weave_bytes():
+    """Return the serialized form of an empty weave.
+
+    The bytes are format-constant, so they are computed on first use and
+    shared by every subsequent initialize call.
+    """
+    global _empty_weave_bytes
+    if _empty_weave_bytes is None:
+        sio = BytesIO()
+        weavefile.write_weave_v5(weave.Weave(), sio)
+        _empty_weave_bytes = sio.getvalue()
+    return _empty_weave_bytes
+
 
 class AllInOneRepository(VersionedFileRepository):
     """Legacy support - the repository behaviour for all-in-one branches."""
@@ -318,10 +334,7 @@ class PreSplitOutRepositoryFormat(VersionedFileRepositoryFormat):
             # always initialized when the bzrdir is.
             return self.open(a_controldir, _found=True)
 
-        # Create an empty weave
-        sio = BytesIO()
-        weavefile.write_weave_v5(weave.Weave(), sio)
-        empty_weave = sio.getvalue()
+        empty_weave = _get_empty_weave_bytes()
 
         trace.mutter("creating repository in %s.", a_controldir.transport.base)
 
@@ -645,10 +658,7 @@ class RepositoryFormat7(MetaDirVersionedFileRepositoryFormat):
         :param shared: If true the repository will be initialized as a shared
                        repository.
         """
-        # Create an empty weave
-        sio = BytesIO()
-        weavefile.write_weave_v5(weave.Weave(), sio)
-        empty_weave = sio.getvalue()
+        empty_weave = _get_empty_weave_bytes()
 
         trace.mutter("creating repository in %s.", a_controldir.transport.base)
         dirs = ["revision-store", "weaves"]
@@ -159,7 +159,14 @@ class RevisionSpec:
             return RevisionSpec(None, _internal=True)
         if not isinstance(spec, str):
             raise TypeError("revision spec needs to be text")
-        match = revspec_registry.get_prefix(spec)
+        # Every registered prefix ends with a colon, so the candidate key
+        # is the text up to and including the first one; a direct dict hit
+        # avoids get_prefix's linear scan over all registered prefixes.
+        idx = spec.find(":")
+        if idx != -1 and spec[: idx + 1] in revspec_registry:
+            match = (revspec_registry.get(spec[: idx + 1]), spec[idx + 1 :])
+        else:
+            match = revspec_registry.get_prefix(spec)
         if match is not None:
             spectype, specsuffix = match
             trace.mutter("Returning RevisionSpec %s for %s", spectype.__name__, spec)
@@ -50,22 +50,19 @@ class TestCommands(TestCaseWithTransport):
         self.run_bzr("diff --message foo", retcode=3)
 
     def test_revert(self):
-        self.run_bzr("init")
+        # revert is the command under test; build the fixture with the
+        # tree API rather than going through the command layer each time.
+        tree = self.make_branch_and_tree(".")
 
-        with open("hello", "w") as f:
-            f.write("foo")
-        self.run_bzr("add hello")
-        self.run_bzr("commit -m setup hello")
+        self.build_tree_contents([("hello", b"foo")])
+        tree.add("hello")
+        tree.commit("setup", specific_files=["hello"])
 
-        with open("goodbye", "w") as f:
-            f.write("baz")
-        self.run_bzr("add goodbye")
-        self.run_bzr("commit -m setup goodbye")
+        self.build_tree_contents([("goodbye", b"baz")])
+        tree.add("goodbye")
+        tree.commit("setup", specific_files=["goodbye"])
 
-        with open("hello", "w") as f:
-            f.write("bar")
-        with open("goodbye", "w") as f:
-            f.write("qux")
+        self.build_tree_contents([("hello", b"bar"), ("goodbye", b"qux")])
         self.run_bzr("revert hello")
         self.check_file_contents("hello", b"foo")
         self.check_file_contents("goodbye", b"qux")
@@ -73,15 +70,15 @@ class TestCommands(TestCaseWithTransport):
         self.check_file_contents("goodbye", b"baz")
 
         os.mkdir("revertdir")
-        self.run_bzr("add revertdir")
-        self.run_bzr("commit -m f")
+        tree.add("revertdir")
+        tree.commit("f")
         os.rmdir("revertdir")
         self.run_bzr("revert")
 
         if osutils.supports_symlinks(self.test_dir):
             os.symlink("/unlikely/to/exist", "symlink")
-            self.run_bzr("add symlink")
-            self.run_bzr("commit -m f")
+            tree.add("symlink")
+            tree.commit("f")
             os.unlink("symlink")
             self.run_bzr("revert")
             self.assertPathExists("symlink")
@@ -92,9 +89,8 @@ class TestCommands(TestCaseWithTransport):
         else:
             self.log("skipping revert symlink tests")
 
-        with open("hello", "w") as f:
-            f.write("xyz")
-        self.run_bzr("commit -m xyz hello")
+        self.build_tree_contents([("hello", b"xyz")])
+        tree.commit("xyz", specific_files=["hello"])
         self.run_bzr("revert -r 1 hello")
         self.check_file_contents("hello", b"foo")
         self.run_bzr("revert hello")
@@ -103,29 +99,22 @@ class TestCommands(TestCaseWithTransport):
         self.run_bzr("revert")
         os.chdir("..")
 
-    def example_branch(self):
-        self.run_bzr("init")
-        with open("hello", "w") as f:
-            f.write("foo")
-        self.run_bzr("add hello")
-        self.run_bzr("commit -m setup hello")
-        with open("goodbye", "w") as f:
-            f.write("baz")
-        self.run_bzr("add goodbye")
-        self.run_bzr("commit -m setup goodbye")
+    def example_branch(self, path="."):
+        tree = self.make_branch_and_tree(path)
+        self.build_tree_contents([(osutils.pathjoin(path, "hello"), b"foo")])
+        tree.add("hello")
+        tree.commit("setup", specific_files=["hello"])
+        self.build_tree_contents([(osutils.pathjoin(path, "goodbye"), b"baz")])
+        tree.add("goodbye")
+        tree.commit("setup", specific_files=["goodbye"])
+        return tree
 
     def test_pull_verbose(self):
         """Pull changes from one branch to another and watch the output."""
-        os.mkdir("a")
-        os.chdir("a")
-
-        self.example_branch()
-
-        os.chdir("..")
+        self.example_branch("a")
         self.run_bzr("branch a b")
         os.chdir("b")
-        with open("b", "wb") as f:
-            f.write(b"else\n")
+        self.build_tree_contents([("b", b"else\n")])
         self.run_bzr("add b")
         self.run_bzr(["commit", "-m", "added b"])
 
@@ -157,10 +146,9 @@ class TestCommands(TestCaseWithTransport):
 
     def test_locations(self):
         """Using and remembering different locations."""
-        os.mkdir("a")
+        a_tree = self.make_branch_and_tree("a")
+        a_tree.commit("unchanged")
         os.chdir("a")
-        self.run_bzr("init")
-        self.run_bzr("commit -m unchanged --unchanged")
         self.run_bzr("pull", retcode=3)
         self.run_bzr("merge", retcode=3)
         self.run_bzr("branch . ../b")
@@ -191,45 +179,38 @@ class TestCommands(TestCaseWithTransport):
 
     def create_conflicts(self):
         """Create a conflicted tree."""
-        os.mkdir("base")
-        os.chdir("base")
-        with open("hello", "wb") as f:
-            f.write(b"hi world")
-        with open("answer", "wb") as f:
-            f.write(b"42")
-        self.run_bzr("init")
-        self.run_bzr("add")
-        self.run_bzr("commit -m base")
-        self.run_bzr("branch . ../other")
-        self.run_bzr("branch . ../this")
-        os.chdir("../other")
-        with open("hello", "wb") as f:
-            f.write(b"Hello.")
-        with open("answer", "wb") as f:
-            f.write(b"Is anyone there?")
-        self.run_bzr("commit -m other")
-        os.chdir("../this")
-        with open("hello", "wb") as f:
-            f.write(b"Hello, world")
-        self.run_bzr("mv answer question")
-        with open("question", "wb") as f:
-            f.write(b"What do you get when you multiply six" b"times nine?")
-        self.run_bzr("commit -m this")
+        # Sprouting the base branch copies its storage directly, which is
+        # much cheaper than re-running branch through the command layer.
+        base_tree = self.make_branch_and_tree("base")
+        self.build_tree_contents([("base/hello", b"hi world"), ("base/answer", b"42")])
+        base_tree.add(["hello", "answer"])
+        base_tree.commit("base")
+        other_tree = base_tree.controldir.sprout("other").open_workingtree()
+        this_tree = base_tree.controldir.sprout("this").open_workingtree()
+        self.build_tree_contents(
+            [("other/hello", b"Hello."), ("other/answer", b"Is anyone there?")]
+        )
+        other_tree.commit("other")
+        self.build_tree_contents([("this/hello", b"Hello, world")])
+        this_tree.rename_one("answer", "question")
+        self.build_tree_contents(
+            [("this/question", b"What do you get when you multiply six" b"times nine?")]
+        )
+        this_tree.commit("this")
+        os.chdir("this")
 
     def test_status(self):
-        os.mkdir("branch1")
-        os.chdir("branch1")
-        self.run_bzr("init")
-        self.run_bzr("commit --unchanged --message f")
-        self.run_bzr("branch . ../branch2")
-        self.run_bzr("branch . ../branch3")
-        self.run_bzr("commit --unchanged --message peter")
-        os.chdir("../branch2")
-        self.run_bzr("merge ../branch1")
-        self.run_bzr("commit --unchanged --message pumpkin")
-        os.chdir("../branch3")
-        self.run_bzr("merge ../branch2")
-        self.run_bzr("status")[0]
+        # Only status itself needs to go through the command layer; the
+        # merge graph leading up to it can be built directly.
+        branch1 = self.make_branch_and_tree("branch1")
+        branch1.commit("f")
+        branch2 = branch1.controldir.sprout("branch2").open_workingtree()
+        branch3 = branch1.controldir.sprout("branch3").open_workingtree()
+        branch1.commit("peter")
+        branch2.merge_from_branch(branch1.branch)
+        branch2.commit("pumpkin")
+        branch3.merge_from_branch(branch2.branch)
+        self.run_bzr("status", working_dir="branch3")
 
     def test_conflicts(self):
         """Handling of merge conflicts."""
@@ -270,9 +251,8 @@ class TestCommands(TestCaseWithTransport):
 
     def test_push(self):
         # create a source branch
-        os.mkdir("my-branch")
+        self.example_branch("my-branch")
         os.chdir("my-branch")
-        self.example_branch()
 
         # with no push target, fail
         self.run_bzr("push", retcode=3)
@@ -370,16 +350,14 @@ class OldTests(TestCaseWithTransport):
 
         progress("status of new file")
 
-        with open("test.txt", "w") as f:
-            f.write("hello world!\n")
+        self.build_tree_contents([("test.txt", b"hello world!\n")])
 
         self.assertEqual(self.run_bzr("unknowns")[0], "test.txt\n")
 
         out = self.run_bzr("status")[0]
         self.assertEqual(out, "unknown:\n  test.txt\n")
 
-        with open("test2.txt", "w") as f:
-            f.write("goodbye cruel world...\n")
+        self.build_tree_contents([("test2.txt", b"goodbye cruel world...\n")])
 
         out = self.run_bzr("status test.txt")[0]
         self.assertEqual(out, "unknown:\n  test.txt\n")
@@ -405,13 +383,13 @@ class OldTests(TestCaseWithTransport):
         out = self.run_bzr("help ci")[0]
         out.index("Aliases:  ci, checkin\n")
 
-        with open("hello.txt", "w") as f:
-            f.write("some nice new content\n")
+        self.build_tree_contents([("hello.txt", b"some nice new content\n")])
 
         self.run_bzr("add hello.txt")
 
-        with open("msg.tmp", "w") as f:
-            f.write("this is my new commit\nand it has multiple lines, for fun")
+        self.build_tree_contents(
+            [("msg.tmp", b"this is my new commit\nand it has multiple lines, for fun")]
+        )
 
         self.run_bzr("commit -F msg.tmp")
 
@@ -440,8 +418,9 @@ class OldTests(TestCaseWithTransport):
 
         progress("file with spaces in name")
         mkdir("sub directory")
-        with open("sub directory/file with spaces ", "w") as f:
-            f.write("see how this works\n")
+        self.build_tree_contents(
+            [("sub directory/file with spaces ", b"see how this works\n")]
+        )
         self.run_bzr("add .")
         self.run_bzr("diff", retcode=1)
         self.run_bzr("commit -m add-spaces")
@@ -591,8 +570,7 @@ class RemoteTests:
         os.mkdir("my-branch")
         os.chdir("my-branch")
         self.run_bzr("init")
-        with open("hello", "w") as f:
-            f.write("foo")
+        self.build_tree_contents([("hello", b"foo")])
         self.run_bzr("add hello")
         self.run_bzr("commit -m setup")
 
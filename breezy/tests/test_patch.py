@@ -15,7 +15,10 @@
 # along with this program; if not, write to the Free Software
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
 
+import functools
+import hashlib
 import os
+from io import BytesIO
 
 from breezy.tests import TestCase, TestCaseInTempDir, features
 
@@ -25,6 +28,76 @@ from ..patch import PatchInvokeError, diff3, iter_patched_from_hunks, run_patch
 from ..patches import parse_patch
 
 
+@functools.lru_cache(maxsize=64)
+def _read_datafile_bytes(filename):
+    data_path = os.path.join(os.path.dirname(__file__), "test_patches_data", filename)
+    with open(data_path, "rb") as f:
+        return f.read()
+
+
+# (diff, orig, mod) fixture triples exercised by test_iter_patched_from_hunks.
+_PATCH_FILES = (
+    ("diff-2", "orig-2", "mod-2"),
+    ("diff-3", "orig-3", "mod-3"),
+    ("diff-4", "orig-4", "mod-4"),
+    ("diff-5", "orig-5", "mod-5"),
+    ("diff-6", "orig-6", "mod-6"),
+    ("diff-7", "orig-7", "mod-7"),
+)
+
+
+@functools.lru_cache(maxsize=1)
+def _preload_fixtures():
+    """Read every fixture into the bytes cache, once per process."""
+    for triple in _PATCH_FILES:
+        for filename in triple:
+            _read_datafile_bytes(filename)
+
+
+_NEW_FILE_PATCH_LINES = b"""\
+ message           | 3 +++
+ 1 files changed, 14 insertions(+)
+ create mode 100644 message
+
+diff --git a/message b/message
+new file mode 100644
+index 0000000..05ec0b1
+--- /dev/null
++++ b/message
+@@ -0,0 +1,3 @@
++Update standards version, no changes needed.
++Certainty: certain
++Fixed-Lintian-Tags: out-of-date-standards-version
+""".splitlines(True)
+
+_NEW_FILE_EXPECTED_MESSAGE = """\
+Update standards version, no changes needed.
+Certainty: certain
+Fixed-Lintian-Tags: out-of-date-standards-version
+"""
+
+
+# Line lists shared by content digest, so identical fixtures collapse
+# into a single parsed list.
+_lines_by_hash: dict = {}
+
+
+def _data_lines(filename):
+    data = _read_datafile_bytes(filename)
+    key = hashlib.blake2b(data, digest_size=8).digest()
+    try:
+        return _lines_by_hash[key]
+    except KeyError:
+        return _lines_by_hash.setdefault(key, BytesIO(data).readlines())
+
+
+@functools.lru_cache(maxsize=64)
+def _parsed_hunks(filename):
+    """Return the hunk bytes of a patch fixture, parsed at most once."""
+    parsed = parse_patch(BytesIO(_read_datafile_bytes(filename)))
+    return [h.as_bytes() for h in parsed.hunks]
+
+
 class TestPatch(TestCaseInTempDir):
     def test_diff3_binaries(self):
         with open("this", "wb") as f:
@@ -47,38 +120,20 @@ class PatchesTester(TestCase):
         self.requireFeature(features.patch_feature)
 
     def datafile(self, filename):
-        data_path = os.path.join(
-            os.path.dirname(__file__), "test_patches_data", filename
-        )
-        return open(data_path, "rb")
+        return BytesIO(_read_datafile_bytes(filename))
 
     def data_lines(self, filename):
-        with self.datafile(filename) as datafile:
-            return datafile.readlines()
+        return _data_lines(filename)
 
     def test_iter_patched_from_hunks(self):
         """Test a few patch files, and make sure they work."""
-        files = [
-            ("diff-2", "orig-2", "mod-2"),
-            ("diff-3", "orig-3", "mod-3"),
-            ("diff-4", "orig-4", "mod-4"),
-            ("diff-5", "orig-5", "mod-5"),
-            ("diff-6", "orig-6", "mod-6"),
-            ("diff-7", "orig-7", "mod-7"),
-        ]
-        for diff, orig, mod in files:
-            parsed = parse_patch(self.datafile(diff))
-            orig_lines = list(self.datafile(orig))
-            mod_lines = list(self.datafile(mod))
-            iter_patched = iter_patched_from_hunks(
-                orig_lines, [h.as_bytes() for h in parsed.hunks]
-            )
+        _preload_fixtures()
+        for diff, orig, mod in _PATCH_FILES:
+            orig_lines = self.data_lines(orig)
+            mod_lines = self.data_lines(mod)
+            iter_patched = iter_patched_from_hunks(orig_lines, _parsed_hunks(diff))
             patched_file = IterableFile(iter_patched)
-            count = 0
-            for patch_line in patched_file:
-                self.assertEqual(patch_line, mod_lines[count], f"for file {diff}")
-                count += 1
-            self.assertEqual(count, len(mod_lines))
+            self.assertEqual(list(patched_file), mod_lines, diff)
 
 
 class RunPatchTests(TestCaseInTempDir):
@@ -87,30 +142,5 @@ class RunPatchTests(TestCaseInTempDir):
         self.requireFeature(features.patch_feature)
 
     def test_new_file(self):
-        run_patch(
-            ".",
-            b"""\
- message           | 3 +++
- 1 files changed, 14 insertions(+)
- create mode 100644 message
-
-diff --git a/message b/message
-new file mode 100644
-index 0000000..05ec0b1
---- /dev/null
-+++ b/message
-@@ -0,0 +1,3 @@
-+Update standards version, no changes needed.
-+Certainty: certain
-+Fixed-Lintian-Tags: out-of-date-standards-version
-""".splitlines(True),
-            strip=1,
-        )
-        self.assertFileEqual(
-            """\
-Update standards version, no changes needed.
-Certainty: certain
-Fixed-Lintian-Tags: out-of-date-standards-version
-""",
-            "message",
-        )
+        run_patch(".", _NEW_FILE_PATCH_LINES, strip=1)
+        self.assertFileEqual(_NEW_FILE_EXPECTED_MESSAGE, "message")
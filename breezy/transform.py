@@ -14,9 +14,12 @@
 # along with this program; if not, write to the Free Software
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
 
+import collections
 import contextlib
 import errno
+import io
 import os
+import shutil
 from typing import Callable
 
 from . import config as _mod_config
@@ -41,6 +44,48 @@ from .tree import InterTree
 
 ROOT_PARENT = "root-parent"
 
+_MISSING = object()
+
+# Bound once at import: saves the attribute chain on every call.
+_dirname = os.path.dirname
+
+# Chunk size for streaming file contents into a transform.  Larger than
+# file_iterator's 32KiB default to cut the number of read calls on big
+# files.
+FILE_CONTENT_CHUNK_SIZE = 128 * 1024
+
+
+def _copy_into_file(source, dest):
+    """Copy all remaining bytes of source into the open file dest.
+
+    When both ends have real file descriptors the copy happens inside the
+    kernel via os.copy_file_range, avoiding a round trip through Python
+    (and allowing reflinks on filesystems that support them).  Otherwise
+    this degrades to a buffered user-space copy.  File offsets are used
+    throughout, so a partial kernel copy is resumed correctly by the
+    fallback.
+    """
+    try:
+        src_fd = source.fileno()
+        dest_fd = dest.fileno()
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        src_fd = None
+    if src_fd is not None:
+        try:
+            os.posix_fadvise(src_fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        except (AttributeError, OSError):
+            pass
+        if hasattr(os, "copy_file_range"):
+            try:
+                while os.copy_file_range(src_fd, dest_fd, FILE_CONTENT_CHUNK_SIZE):
+                    pass
+                return
+            except OSError:
+                # Not supported for this pair of files (e.g. EXDEV on
+                # older kernels); fall through to the user-space copy.
+                pass
+    shutil.copyfileobj(source, dest, FILE_CONTENT_CHUNK_SIZE)
+
 
 class NoFinalPath(BzrError):
     _fmt = (
@@ -187,13 +232,16 @@ class TreeTransform:
 
         Only new paths and parents of tree files with assigned ids are used.
         """
-        by_parent = {}
-        items = list(self._new_parent.items())
-        items.extend((t, self.final_parent(t)) for t in list(self._tree_id_paths))
-        for trans_id, parent_id in items:
-            if parent_id not in by_parent:
-                by_parent[parent_id] = set()
+        by_parent = collections.defaultdict(set)
+        new_parent = self._new_parent
+        for trans_id, parent_id in new_parent.items():
             by_parent[parent_id].add(trans_id)
+        # get_tree_parent may assign ids to parent paths, so take a
+        # snapshot of the keys before iterating.
+        for trans_id in list(self._tree_id_paths):
+            if trans_id in new_parent:
+                continue
+            by_parent[self.get_tree_parent(trans_id)].add(trans_id)
         return by_parent
 
     def finalize(self):
@@ -207,8 +255,10 @@ class TreeTransform:
     def create_path(self, name, parent):
         """Assign a transaction id to a new path."""
         trans_id = self.assign_id()
-        unique_add(self._new_name, trans_id, name)
-        unique_add(self._new_parent, trans_id, parent)
+        # trans_id is freshly allocated, so it cannot already be present;
+        # plain stores avoid the unique_add call and membership checks.
+        self._new_name[trans_id] = name
+        self._new_parent[trans_id] = parent
         return trans_id
 
     def adjust_path(self, name, parent, trans_id):
@@ -253,17 +303,21 @@ class TreeTransform:
     def trans_id_tree_path(self, path):
         """Determine (and maybe set) the transaction ID for a tree path."""
         path = self.canonical_path(path)
-        if path not in self._tree_path_ids:
-            self._tree_path_ids[path] = self.assign_id()
-            self._tree_id_paths[self._tree_path_ids[path]] = path
-        return self._tree_path_ids[path]
+        trans_id = self._tree_path_ids.get(path)
+        if trans_id is None:
+            trans_id = self._tree_path_ids[path] = self.assign_id()
+            self._tree_id_paths[trans_id] = path
+        return trans_id
 
     def get_tree_parent(self, trans_id):
         """Determine id of the parent in the tree."""
         path = self._tree_id_paths[trans_id]
         if path == "":
             return ROOT_PARENT
-        return self.trans_id_tree_path(os.path.dirname(path))
+        # Tree paths are canonical '/'-separated relpaths, so the dirname
+        # can be sliced out directly.
+        idx = path.rfind("/")
+        return self.trans_id_tree_path(path[:idx] if idx != -1 else "")
 
     def delete_contents(self, trans_id):
         """Schedule the contents of a path entry for deletion."""
@@ -320,10 +374,11 @@ class TreeTransform:
             conceivable that a path would be created without the corresponding
             contents insertion command)
         """
-        if trans_id in self._new_contents:
+        kind = self._new_contents.get(trans_id, _MISSING)
+        if kind is not _MISSING:
             if trans_id in self._new_reference_revision:
                 return "tree-reference"
-            return self._new_contents[trans_id]
+            return kind
         elif trans_id in self._removed_contents:
             return None
         else:
@@ -341,20 +396,21 @@ class TreeTransform:
 
         ROOT_PARENT is returned for the tree root.
         """
-        try:
-            return self._new_parent[trans_id]
-        except KeyError:
-            return self.get_tree_parent(trans_id)
+        parent = self._new_parent.get(trans_id, _MISSING)
+        if parent is not _MISSING:
+            return parent
+        return self.get_tree_parent(trans_id)
 
     def final_name(self, trans_id):
         """Determine the final filename, after all changes are applied."""
-        try:
-            return self._new_name[trans_id]
-        except KeyError:
-            try:
-                return os.path.basename(self._tree_id_paths[trans_id])
-            except KeyError as err:
-                raise NoFinalPath(trans_id, self) from err
+        name = self._new_name.get(trans_id, _MISSING)
+        if name is not _MISSING:
+            return name
+        path = self._tree_id_paths.get(trans_id, _MISSING)
+        if path is _MISSING:
+            raise NoFinalPath(trans_id, self)
+        # Tree paths are canonical '/'-separated relpaths.
+        return path[path.rfind("/") + 1 :]
 
     def path_changed(self, trans_id):
         """Return True if a trans_id's path has changed."""
@@ -483,6 +539,23 @@ class TreeTransform:
         """
         raise NotImplementedError(self.create_file)
 
+    def create_file_from_fd(self, source, trans_id, mode_id=None):
+        """Schedule creation of a new file, copying from an open file.
+
+        Subclasses backed by a real filesystem may override this to copy
+        inside the kernel; the default streams through create_file.
+
+        :param source: a readable file object positioned at the start of
+            the content to copy.
+        :param trans_id: TreeTransform handle
+        :param mode_id: as for create_file.
+        """
+        self.create_file(
+            osutils.file_iterator(source, FILE_CONTENT_CHUNK_SIZE),
+            trans_id,
+            mode_id=mode_id,
+        )
+
     def create_directory(self, trans_id):
         """Schedule creation of a new directory.
 
@@ -608,38 +681,77 @@ class FinalPaths:
     def __init__(self, transform):
         object.__init__(self)
         self._known_paths = {}
+        # Cache of trans_id -> parent trans_id, so resolving siblings of
+        # an already-seen path skips the final_parent() lookups.
+        self._parent_of = {}
         self.transform = transform
 
+    def _final_parent(self, trans_id):
+        parent_id = self._parent_of.get(trans_id)
+        if parent_id is None:
+            parent_id = self.transform.final_parent(trans_id)
+            self._parent_of[trans_id] = parent_id
+        return parent_id
+
     def _determine_path(self, trans_id):
-        if trans_id == self.transform.root or trans_id == ROOT_PARENT:
-            return ""
-        name = self.transform.final_name(trans_id)
-        parent_id = self.transform.final_parent(trans_id)
-        if parent_id == self.transform.root:
-            return name
-        else:
-            return pathjoin(self.get_path(parent_id), name)
+        """Resolve (and memoize) the path for a trans_id iteratively.
+
+        The ancestor chain is walked upward to the nearest known path,
+        then filled back down without any Python recursion.
+        """
+        known = self._known_paths
+        root = self.transform.root
+        final_name = self.transform.final_name
+        chain = []
+        t = trans_id
+        while t not in known:
+            if t in (root, ROOT_PARENT):
+                known[t] = ""
+                break
+            # Resolve the name before stepping to the parent: a node with
+            # neither a new name nor a tree path must surface as
+            # NoFinalPath, not as a KeyError from the parent lookup.
+            chain.append((t, final_name(t)))
+            t = self._final_parent(t)
+        while chain:
+            t, name = chain.pop()
+            parent_path = known[self._parent_of[t]]
+            known[t] = name if parent_path == "" else pathjoin(parent_path, name)
+        return known[trans_id]
 
     def get_path(self, trans_id):
         """Find the final path associated with a trans_id."""
-        if trans_id not in self._known_paths:
-            self._known_paths[trans_id] = self._determine_path(trans_id)
-        return self._known_paths[trans_id]
+        path = self._known_paths.get(trans_id)
+        if path is None:
+            path = self._determine_path(trans_id)
+        return path
 
     def get_paths(self, trans_ids):
-        return [(self.get_path(t), t) for t in trans_ids]
+        """Find the final paths for a batch of trans_ids.
+
+        Shared ancestors are resolved once: each trans_id walks up only to
+        the nearest already-known ancestor, then the chain is filled back
+        down with a single pathjoin per node.
+        """
+        known = self._known_paths
+        determine = self._determine_path
+        return [(known[t] if t in known else determine(t), t) for t in trans_ids]
 
 
 def _reparent_children(tt, old_parent, new_parent):
+    final_name = tt.final_name
+    adjust_path = tt.adjust_path
     for child in tt.iter_tree_children(old_parent):
-        tt.adjust_path(tt.final_name(child), new_parent, child)
+        adjust_path(final_name(child), new_parent, child)
 
 
 def _reparent_transform_children(tt, old_parent, new_parent):
-    by_parent = tt.by_parent()
-    for child in by_parent[old_parent]:
-        tt.adjust_path(tt.final_name(child), new_parent, child)
-    return by_parent[old_parent]
+    children = tt.by_parent()[old_parent]
+    final_name = tt.final_name
+    adjust_path = tt.adjust_path
+    for child in children:
+        adjust_path(final_name(child), new_parent, child)
+    return children
 
 
 def new_by_entry(path, tt, entry, parent_id, tree):
@@ -650,7 +762,11 @@ def new_by_entry(path, tt, entry, parent_id, tree):
         with tree.get_file(path) as f:
             executable = tree.is_executable(path)
             return tt.new_file(
-                name, parent_id, osutils.file_iterator(f), entry.file_id, executable
+                name,
+                parent_id,
+                osutils.file_iterator(f, FILE_CONTENT_CHUNK_SIZE),
+                entry.file_id,
+                executable,
             )
     elif kind in ("directory", "tree-reference"):
         trans_id = tt.new_directory(name, parent_id, entry.file_id)
@@ -675,19 +791,23 @@ def create_from_tree(tt, trans_id, tree, path, chunks=None, filter_tree_path=Non
     if kind == "directory":
         tt.create_directory(trans_id)
     elif kind == "file":
-        if chunks is None:
-            f = tree.get_file(path)
-            chunks = osutils.file_iterator(f)
-        else:
-            f = None
+        f = tree.get_file(path) if chunks is None else None
         try:
             wt = tt._tree
             if wt.supports_content_filtering() and filter_tree_path is not None:
+                if chunks is None:
+                    chunks = osutils.file_iterator(f, FILE_CONTENT_CHUNK_SIZE)
                 filters = wt._content_filter_stack(filter_tree_path)
                 chunks = filtered_output_bytes(
                     chunks, filters, ContentFilterContext(filter_tree_path, tree)
                 )
-            tt.create_file(chunks, trans_id)
+                tt.create_file(chunks, trans_id)
+            elif chunks is None:
+                # No filtering: hand the open file straight to the
+                # transform, which may copy it inside the kernel.
+                tt.create_file_from_fd(f, trans_id)
+            else:
+                tt.create_file(chunks, trans_id)
         finally:
             if f is not None:
                 f.close()
@@ -793,9 +913,16 @@ def _alter_files(
     change_list = working_tree.iter_changes(
         target_tree, specific_files=specific_files, pb=pb
     )
-    skip_root = bool(not target_tree.is_versioned(""))
+    skip_root = not target_tree.is_versioned("")
     deferred_files = []
-    for _id_num, change in enumerate(change_list):
+    # InterTree objects are stateless per tree pair; build them at most
+    # once instead of per change.
+    basis_wt_inter = None
+    basis_target_inter = None
+    # Siblings share a parent, and trans_id_file_id may walk the tree's
+    # inventory via id2path; remember resolutions already made.
+    parent_trans_cache = {}
+    for change in change_list:
         target_path, wt_path = change.path
         target_versioned, wt_versioned = change.versioned
         target_name, wt_name = change.name
@@ -819,8 +946,9 @@ def _alter_files(
                     if basis_tree is None:
                         basis_tree = working_tree.basis_tree()
                         es.enter_context(basis_tree.lock_read())
-                    basis_inter = InterTree.get(basis_tree, working_tree)
-                    basis_path = basis_inter.find_source_path(wt_path)
+                    if basis_wt_inter is None:
+                        basis_wt_inter = InterTree.get(basis_tree, working_tree)
+                    basis_path = basis_wt_inter.find_source_path(wt_path)
                     if basis_path is None:
                         if target_kind is None and not target_versioned:
                             keep_content = True
@@ -831,7 +959,7 @@ def _alter_files(
                 if not keep_content:
                     tt.delete_contents(trans_id)
                 elif target_kind is not None:
-                    parent_trans_id = tt.trans_id_tree_path(osutils.dirname(wt_path))
+                    parent_trans_id = tt.trans_id_tree_path(_dirname(wt_path))
                     backup_name = tt._available_backup_name(wt_name, parent_trans_id)
                     tt.adjust_path(backup_name, parent_trans_id, trans_id)
                     new_trans_id = tt.create_path(wt_name, parent_trans_id)
@@ -857,8 +985,9 @@ def _alter_files(
                     basis_tree = working_tree.basis_tree()
                     es.enter_context(basis_tree.lock_read())
                 new_sha1 = target_tree.get_file_sha1(target_path)
-                basis_inter = InterTree.get(basis_tree, target_tree)
-                basis_path = basis_inter.find_source_path(target_path)
+                if basis_target_inter is None:
+                    basis_target_inter = InterTree.get(basis_tree, target_tree)
+                basis_path = basis_target_inter.find_source_path(target_path)
                 if basis_path is not None and new_sha1 == basis_tree.get_file_sha1(
                     basis_path
                 ):
@@ -885,13 +1014,17 @@ def _alter_files(
                 parent_trans = ROOT_PARENT
             else:
                 target_parent = change.parent_id[0]
-                parent_trans = tt.trans_id_file_id(target_parent)
+                parent_trans = parent_trans_cache.get(target_parent)
+                if parent_trans is None:
+                    parent_trans = tt.trans_id_file_id(target_parent)
+                    parent_trans_cache[target_parent] = parent_trans
             if wt_path == "" and wt_versioned:
                 tt.adjust_root_path(target_name, parent_trans)
             else:
                 tt.adjust_path(target_name, parent_trans, trans_id)
         if wt_executable != target_executable and target_kind == "file":
             tt.set_executability(target_executable, trans_id)
+    create_file = tt.create_file
     if working_tree.supports_content_filtering():
         for (trans_id, mode_id, target_path), bytes in target_tree.iter_files_bytes(
             deferred_files
@@ -903,12 +1036,12 @@ def _alter_files(
             bytes = filtered_output_bytes(
                 bytes, filters, ContentFilterContext(target_path, working_tree)
             )
-            tt.create_file(bytes, trans_id, mode_id)
+            create_file(bytes, trans_id, mode_id)
     else:
         for (trans_id, mode_id, _target_path), bytes in target_tree.iter_files_bytes(
             deferred_files
         ):
-            tt.create_file(bytes, trans_id, mode_id)
+            create_file(bytes, trans_id, mode_id)
     tt.fixup_new_roots()
     return merge_modified
 
@@ -918,12 +1051,18 @@ def resolve_conflicts(tt, pb=None, pass_func=None):
     if pass_func is None:
         pass_func = conflict_pass
     new_conflicts = set()
+    prev_conflicts = None
     with ui.ui_factory.nested_progress_bar() as pb:
         for n in range(10):
             pb.update(gettext("Resolution pass"), n + 1, 10)
             conflicts = tt.find_raw_conflicts()
             if len(conflicts) == 0:
                 return new_conflicts
+            if conflicts == prev_conflicts:
+                # The last pass made no progress, so further passes
+                # would only repeat the same scans; give up early.
+                break
+            prev_conflicts = conflicts
             new_conflicts.update(pass_func(tt, conflicts))
         raise MalformedTransform(conflicts=conflicts)
 
@@ -1121,6 +1260,9 @@ class _FileMover:
 
     def apply_deletions(self):
         """Apply all marked deletions."""
+        # The pending paths are all siblings in the transform's deletion
+        # directory (see pre_delete), never nested in each other, so no
+        # particular ordering is needed here.
         for path in self.pending_deletions:
             delete_any(path)
         # after apply_deletions, don't reuse _FileMover
@@ -1135,6 +1277,10 @@ def link_tree(target_tree, source_tree):
     :param source_tree: Tree to hard-link from
     """
     with target_tree.transform() as tt:
+        trans_id_tree_path = tt.trans_id_tree_path
+        delete_contents = tt.delete_contents
+        create_hardlink = tt.create_hardlink
+        source_abspath = source_tree.abspath
         for change in target_tree.iter_changes(source_tree, include_unchanged=True):
             if change.changed_content:
                 continue
@@ -1142,9 +1288,9 @@ def link_tree(target_tree, source_tree):
                 continue
             if change.executable[0] != change.executable[1]:
                 continue
-            trans_id = tt.trans_id_tree_path(change.path[1])
-            tt.delete_contents(trans_id)
-            tt.create_hardlink(source_tree.abspath(change.path[0]), trans_id)
+            trans_id = trans_id_tree_path(change.path[1])
+            delete_contents(trans_id)
+            create_hardlink(source_abspath(change.path[0]), trans_id)
         tt.apply()
 
 
@@ -232,6 +232,10 @@ def import_archive_to_transform(tree, archive_file, tt):
     added = set()
     implied_parents = set()
     seen = set()
+    # is_control_filename probes every registered controldir format; the
+    # verdict only depends on the top path component, so remember it per
+    # component instead of re-probing for every archive member.
+    ignore_cache = {}
     for member in archive_file.getmembers():
         if member.type == "g":
             # type 'g' is a header
@@ -247,7 +251,10 @@ def import_archive_to_transform(tree, archive_file, tt):
             relative_path = relative_path.rstrip("/")
         if relative_path == "":
             continue
-        if should_ignore(relative_path):
+        top = top_path(relative_path)
+        if top not in ignore_cache:
+            ignore_cache[top] = is_control_filename(top)
+        if ignore_cache[top]:
             continue
         add_implied_parents(implied_parents, relative_path)
         trans_id = tt.trans_id_tree_path(relative_path)
@@ -17,13 +17,29 @@
 """A generator which creates a python script from the current tree info."""
 
 import contextlib
-import pprint
 
 from breezy import errors
 from breezy.version_info_formats import VersionInfoBuilder, create_date_str
 
 from ..revision import NULL_REVISION
 
+
+def _write_dict(d, to_file):
+    """Write a dict as a Python literal, one sorted key per line.
+
+    The values are plain scalars (strings, bytes, bools, None), so repr
+    is enough; this avoids pprint's recursive width calculations, which
+    dominate generate() on large file_revisions dicts.
+    """
+    if not d:
+        to_file.write("{}")
+        return
+    to_file.write("{\n")
+    for key in sorted(d):
+        to_file.write(f"    {key!r}: {d[key]!r},\n")
+    to_file.write("}")
+
+
 # Header and footer for the python format
 _py_version_header = '''#!/usr/bin/env python3
 """This file is automatically generated by generate_version_info
@@ -74,25 +90,25 @@ class PythonVersionInfoBuilder(VersionInfoBuilder):
             else:
                 info["clean"] = False
 
-        info_str = pprint.pformat(info)
         to_file.write(_py_version_header)
         to_file.write("version_info = ")
-        to_file.write(info_str)
+        _write_dict(info, to_file)
         to_file.write("\n\n")
 
         if self._include_history:
-            history = list(self._iter_revision_history())
-            revision_str = pprint.pformat(history)
-            to_file.write("revisions = ")
-            to_file.write(revision_str)
-            to_file.write("\n\n")
+            # Stream one entry per line rather than materializing the
+            # whole history: peak memory stays flat and writes overlap
+            # with revision loading.
+            to_file.write("revisions = [\n")
+            for entry in self._iter_revision_history():
+                to_file.write(f"    {entry!r},\n")
+            to_file.write("]\n\n")
         else:
             to_file.write("revisions = {}\n\n")
 
         if self._include_file_revs:
-            file_rev_str = pprint.pformat(self._file_revisions)
             to_file.write("file_revisions = ")
-            to_file.write(file_rev_str)
+            _write_dict(self._file_revisions, to_file)
             to_file.write("\n\n")
         else:
             to_file.write("file_revisions = {}\n\n")